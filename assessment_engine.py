@@ -1,12 +1,77 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 from typing import Dict, List, Tuple
-import json
+import orjson
+import bisect
+import math
 from datetime import datetime, timedelta
 import numpy as np
 
+# Performance fields copied from a session into its analysis
+PERFORMANCE_METRICS = ("accuracy", "words_per_minute", "fluency_score", "total_words", "mistakes", "missed_words")
+
+# Append-only log of completed session records, one JSON object per line
+SESSIONS_LOG = "assessment_sessions.jsonl"
+
+# Numeric fields kept in columnar form for each history list
+HISTORY_COLUMNS = {
+    "reading_sessions": PERFORMANCE_METRICS,
+    "progress_over_time": ("accuracy", "words_per_minute", "fluency_score", "words_mastered", "average_mastery")
+}
+
+# Per-session recommendation tiers: (metric, ascending thresholds, message per tier or None)
+SESSION_RECOMMENDATION_TIERS = (
+    ("accuracy", (70, 85), (
+        "Focus on word recognition and phonics practice",
+        "Continue practicing challenging words",
+        "Great accuracy! Ready for more complex texts"
+    )),
+    # Speed praise starts strictly above 50 WPM
+    ("words_per_minute", (20, math.nextafter(50, math.inf)), (
+        "Practice reading aloud to improve speed",
+        None,
+        "Excellent reading speed! Focus on comprehension"
+    )),
+    ("fluency_score", (60, 80), (
+        "Practice reading with expression and rhythm",
+        "Good fluency! Continue regular practice",
+        None
+    ))
+)
+
+# Overall recommendation tiers, in the same form as the per-session ones
+OVERALL_RECOMMENDATION_TIERS = (
+    ("total_sessions", (5, 10), (
+        "Increase reading frequency to at least 3-4 sessions per week",
+        "Good reading frequency! Continue with regular practice",
+        "Excellent reading consistency! Consider more challenging texts"
+    )),
+    # Accuracy and speed praise start strictly above 90% and 45 WPM
+    ("recent_accuracy", (75, math.nextafter(90, math.inf)), (
+        "Focus on accuracy over speed - practice difficult words",
+        None,
+        "Excellent accuracy! Ready for more complex vocabulary"
+    )),
+    ("recent_wpm", (20, math.nextafter(45, math.inf)), (
+        "Practice reading aloud to improve reading speed",
+        None,
+        "Great reading speed! Focus on comprehension and expression"
+    ))
+)
+
+def _tier_messages(tiers: Tuple, metrics: Dict) -> List[str]:
+    """Pick the message for the tier each metric falls into"""
+    messages = []
+    for metric, thresholds, tier_messages in tiers:
+        message = tier_messages[bisect.bisect_right(thresholds, metrics[metric])]
+        if message:
+            messages.append(message)
+    return messages
+
+def _history_replaced(cached: List | None, history: List, cached_count: int) -> bool:
+    """Whether an incremental cache must start over: the history was replaced (e.g. reloaded) or shrank"""
+    return cached is not history or cached_count > len(history)
+
 class AssessmentEngine:
     def __init__(self):
         self.assessment_data = {
@@ -15,6 +80,71 @@ class AssessmentEngine:
             "progress_over_time": [],
             "recommendations": []
         }
+        
+        # Revision of the session state data last loaded or saved
+        self._loaded_rev = -1
+        
+        # Columnar copies of the numeric history fields, keyed by history list name
+        self._column_cache = {}
+        
+        # Running per-word totals across sessions, plus the last word report
+        self._reset_word_agg(None)
+        
+        # Cached progress dates as datetime64[D], parallel to progress_over_time
+        self._dates_cache = None
+        
+        # Last set of progress charts and the history state they were built from
+        self._chart_cache = None
+        
+        # Last parent report and the history state it was built from
+        self._report_cache = None
+    
+    def _history_columns(self, source: str = "reading_sessions") -> Dict[str, np.ndarray]:
+        """Get a history list's numeric fields as columns, one float array per field"""
+        entries = self.assessment_data[source]
+        cache = self._column_cache.get(source)
+        
+        if cache is None or _history_replaced(cache["entries"], entries, cache["count"]):
+            cache = self._column_cache[source] = {
+                "entries": entries,
+                "count": 0,
+                "columns": {name: np.zeros(64) for name in HISTORY_COLUMNS[source]}
+            }
+        
+        # Only copy in entries added since the last call
+        count, columns = cache["count"], cache["columns"]
+        if count < len(entries):
+            capacity = len(columns[HISTORY_COLUMNS[source][0]])
+            if len(entries) > capacity:
+                # Grow geometrically so appends stay amortized O(1)
+                capacity = max(len(entries), 2 * capacity)
+                for name, column in columns.items():
+                    grown = np.zeros(capacity)
+                    grown[:count] = column[:count]
+                    columns[name] = grown
+            
+            new_metrics = [entry.get("performance_metrics", entry) for entry in entries[count:]]
+            for name, column in columns.items():
+                column[count:len(entries)] = [metrics.get(name, 0) for metrics in new_metrics]
+            cache["count"] = len(entries)
+        
+        return {name: column[:len(entries)] for name, column in columns.items()}
+    
+    def _progress_dates(self) -> np.ndarray:
+        """Get the progress history dates as a datetime64[D] array"""
+        progress = self.assessment_data["progress_over_time"]
+        cached_progress, dates = self._dates_cache or (None, [])
+        
+        if _history_replaced(cached_progress, progress, len(dates)):
+            dates = np.empty(0, dtype="datetime64[D]")
+        
+        # Only parse dates added since the last call
+        if len(dates) < len(progress):
+            new_dates = np.array([p["date"] for p in progress[len(dates):]], dtype="datetime64[D]")
+            dates = np.concatenate([dates, new_dates])
+        
+        self._dates_cache = (progress, dates)
+        return dates
     
     def analyze_reading_session(self, session_data: Dict) -> Dict:
         """Analyze a single reading session"""
@@ -30,24 +160,29 @@ class AssessmentEngine:
         
         # Analyze performance metrics
         performance = session_data.get("performance", {})
-        analysis["performance_metrics"] = {
-            "accuracy": performance.get("accuracy", 0),
-            "words_per_minute": performance.get("words_per_minute", 0),
-            "fluency_score": performance.get("fluency_score", 0),
-            "total_words": performance.get("total_words", 0),
-            "mistakes": performance.get("mistakes", 0),
-            "missed_words": performance.get("missed_words", 0)
-        }
+        analysis["performance_metrics"] = {key: performance.get(key, 0) for key in PERFORMANCE_METRICS}
+        
+        # Analyze word mastery from a single preallocated array of mastery levels
+        words_read = performance.get("words_read", {})
+        if words_read:
+            mastery = np.fromiter((stats.get("mastery_level", 0) for stats in words_read.values()),
+                                  dtype=float, count=len(words_read))
+            words_mastered = int((mastery >= 90).sum())
+            words_needing_practice = int((mastery < 70).sum())
+            average_mastery = float(mastery.mean())
+        else:
+            words_mastered = words_needing_practice = average_mastery = 0
         
-        # Analyze word mastery
-        words_read = session_data.get("words_read", {})
         analysis["word_analysis"] = {
             "words_attempted": len(words_read),
-            "words_mastered": len([w for w, stats in words_read.items() if stats.get("mastery_level", 0) >= 90]),
-            "words_needing_practice": len([w for w, stats in words_read.items() if stats.get("mastery_level", 0) < 70]),
-            "average_mastery": np.mean([stats.get("mastery_level", 0) for stats in words_read.values()]) if words_read else 0
+            "words_mastered": words_mastered,
+            "words_needing_practice": words_needing_practice,
+            "average_mastery": average_mastery
         }
         
+        # Keep a snapshot of the word stats so the word mastery report can aggregate them
+        analysis["words_read"] = {word: dict(stats) for word, stats in words_read.items()}
+        
         # Generate session-specific recommendations
         analysis["recommendations"] = self.generate_session_recommendations(analysis)
         
@@ -55,30 +190,8 @@ class AssessmentEngine:
     
     def generate_session_recommendations(self, analysis: Dict) -> List[str]:
         """Generate recommendations based on session analysis"""
-        recommendations = []
-        
-        # Accuracy-based recommendations
-        accuracy = analysis["performance_metrics"]["accuracy"]
-        if accuracy < 70:
-            recommendations.append("Focus on word recognition and phonics practice")
-        elif accuracy < 85:
-            recommendations.append("Continue practicing challenging words")
-        else:
-            recommendations.append("Great accuracy! Ready for more complex texts")
-        
-        # Speed-based recommendations
-        wpm = analysis["performance_metrics"]["words_per_minute"]
-        if wpm < 20:
-            recommendations.append("Practice reading aloud to improve speed")
-        elif wpm > 50:
-            recommendations.append("Excellent reading speed! Focus on comprehension")
-        
-        # Fluency-based recommendations
-        fluency = analysis["performance_metrics"]["fluency_score"]
-        if fluency < 60:
-            recommendations.append("Practice reading with expression and rhythm")
-        elif fluency < 80:
-            recommendations.append("Good fluency! Continue regular practice")
+        # Accuracy-, speed- and fluency-based recommendations
+        recommendations = _tier_messages(SESSION_RECOMMENDATION_TIERS, analysis["performance_metrics"])
         
         # Word mastery recommendations
         words_needing_practice = analysis["word_analysis"]["words_needing_practice"]
@@ -90,7 +203,7 @@ class AssessmentEngine:
     def track_progress_over_time(self, session_analysis: Dict):
         """Track reading progress over time"""
         progress_point = {
-            "date": session_analysis["timestamp"][:10],  # Just the date part
+            "date": datetime.fromisoformat(session_analysis["timestamp"]).date(),  # Just the date part
             "accuracy": session_analysis["performance_metrics"]["accuracy"],
             "words_per_minute": session_analysis["performance_metrics"]["words_per_minute"],
             "fluency_score": session_analysis["performance_metrics"]["fluency_score"],
@@ -102,85 +215,157 @@ class AssessmentEngine:
     
     def generate_progress_charts(self) -> Dict:
         """Generate progress visualization charts"""
-        if not self.assessment_data["progress_over_time"]:
+        progress = self.assessment_data["progress_over_time"]
+        if not progress:
             return {}
         
-        df = pd.DataFrame(self.assessment_data["progress_over_time"])
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
+        # Reuse the figures until a new progress point is tracked
+        cache_key = (len(progress), progress[-1]["date"])
+        if self._chart_cache and self._chart_cache[0] is progress and self._chart_cache[1] == cache_key:
+            return self._chart_cache[2]
+        
+        # Progress points are appended in session order, so they are already chronological
+        dates = self._progress_dates()
+        columns = self._history_columns("progress_over_time")
+        accuracy, wpm, fluency = columns["accuracy"], columns["words_per_minute"], columns["fluency_score"]
+        words_mastered = columns["words_mastered"]
         
         charts = {}
         
         # Accuracy over time
-        fig_accuracy = px.line(df, x='date', y='accuracy', 
-                              title='Reading Accuracy Over Time',
-                              labels={'accuracy': 'Accuracy (%)', 'date': 'Date'})
-        fig_accuracy.update_layout(yaxis_range=[0, 100])
+        fig_accuracy = go.Figure(go.Scatter(x=dates, y=accuracy, mode='lines'))
+        fig_accuracy.update_layout(title='Reading Accuracy Over Time',
+                                   xaxis_title='Date', yaxis_title='Accuracy (%)',
+                                   yaxis_range=[0, 100])
         charts['accuracy'] = fig_accuracy
         
         # Words per minute over time
-        fig_wpm = px.line(df, x='date', y='words_per_minute',
-                         title='Reading Speed Over Time',
-                         labels={'words_per_minute': 'Words per Minute', 'date': 'Date'})
+        fig_wpm = go.Figure(go.Scatter(x=dates, y=wpm, mode='lines'))
+        fig_wpm.update_layout(title='Reading Speed Over Time',
+                              xaxis_title='Date', yaxis_title='Words per Minute')
         charts['wpm'] = fig_wpm
         
         # Fluency score over time
-        fig_fluency = px.line(df, x='date', y='fluency_score',
-                             title='Fluency Score Over Time',
-                             labels={'fluency_score': 'Fluency Score (%)', 'date': 'Date'})
-        fig_fluency.update_layout(yaxis_range=[0, 100])
+        fig_fluency = go.Figure(go.Scatter(x=dates, y=fluency, mode='lines'))
+        fig_fluency.update_layout(title='Fluency Score Over Time',
+                                  xaxis_title='Date', yaxis_title='Fluency Score (%)',
+                                  yaxis_range=[0, 100])
         charts['fluency'] = fig_fluency
         
         # Words mastered over time
-        fig_mastered = px.bar(df, x='date', y='words_mastered',
-                             title='Words Mastered Over Time',
-                             labels={'words_mastered': 'Words Mastered', 'date': 'Date'})
+        fig_mastered = go.Figure(go.Bar(x=dates, y=words_mastered))
+        fig_mastered.update_layout(title='Words Mastered Over Time',
+                                   xaxis_title='Date', yaxis_title='Words Mastered')
         charts['mastered'] = fig_mastered
         
+        # Keep zoom/pan state when Streamlit re-sends an unchanged figure
+        for fig in charts.values():
+            fig.update_layout(uirevision="progress")
+        
+        self._chart_cache = (progress, cache_key, charts)
         return charts
     
-    def generate_word_mastery_report(self) -> Dict:
+    def _reset_word_agg(self, sessions):
+        """Clear the word aggregate so it can be rebuilt from the given sessions"""
+        # Struct-of-arrays: word -> row index, with counts kept in parallel arrays
+        self._word_index = {}
+        self._word_correct = np.zeros(0, dtype=np.int64)
+        self._word_total = np.zeros(0, dtype=np.int64)
+        self._word_first_seen = []
+        self._word_last_seen = []
+        self._word_agg_source = sessions
+        self._word_agg_count = 0
+        self._word_report_cache = None
+    
+    def _ingest_session_words(self, session: Dict):
+        """Fold a session's word stats into the running word aggregate"""
+        words_read = session.get("words_read", {})
+        if not words_read:
+            return
+        
+        timestamp = session.get("timestamp", "")
+        indices = []
+        for word in words_read:
+            idx = self._word_index.get(word)
+            if idx is None:
+                idx = self._word_index[word] = len(self._word_first_seen)
+                self._word_first_seen.append(timestamp)
+                self._word_last_seen.append(timestamp)
+            else:
+                self._word_last_seen[idx] = timestamp
+            indices.append(idx)
+        
+        # Grow the count arrays geometrically so ingest stays amortized O(words)
+        word_count = len(self._word_first_seen)
+        if word_count > len(self._word_correct):
+            capacity = max(word_count, 2 * len(self._word_correct), 64)
+            padding = np.zeros(capacity - len(self._word_correct), dtype=np.int64)
+            self._word_correct = np.concatenate([self._word_correct, padding])
+            self._word_total = np.concatenate([self._word_total, padding])
+        
+        # Words are unique within a session, so a fancy-indexed add is safe
+        self._word_correct[indices] += [stats.get("correct_count", 0) for stats in words_read.values()]
+        self._word_total[indices] += [stats.get("total_count", 0) for stats in words_read.values()]
+    
+    def _sync_word_agg(self):
+        """Ingest sessions added since the word aggregate was last updated"""
+        sessions = self.assessment_data["reading_sessions"]
+        
+        if _history_replaced(self._word_agg_source, sessions, self._word_agg_count):
+            self._reset_word_agg(sessions)
+        
+        for session in sessions[self._word_agg_count:]:
+            self._ingest_session_words(session)
+        self._word_agg_count = len(sessions)
+    
+    def generate_word_mastery_report(self, include_details: bool = True) -> Dict:
         """Generate detailed word mastery report"""
-        all_words = {}
-        
-        # Aggregate word mastery data from all sessions
-        for session in self.assessment_data["reading_sessions"]:
-            words_read = session.get("words_read", {})
-            for word, stats in words_read.items():
-                if word not in all_words:
-                    all_words[word] = {
-                        "correct_count": 0,
-                        "total_count": 0,
-                        "mastery_level": 0,
-                        "first_seen": session.get("timestamp", ""),
-                        "last_seen": session.get("timestamp", "")
+        self._sync_word_agg()
+        
+        # Reuse the last report until new sessions arrive
+        session_count = self._word_agg_count
+        cached = self._word_report_cache
+        if cached and cached[0] == session_count and ("word_details" in cached[1] or not include_details):
+            return cached[1]
+        
+        # Calculate mastery levels from the aggregated counts in one pass
+        words = list(self._word_index)
+        correct = self._word_correct[:len(words)]
+        total = self._word_total[:len(words)]
+        mastery = np.divide(correct, total, out=np.zeros(len(words)), where=total > 0) * 100
+        
+        # Categorize words: 0 = needs practice, 1 = improving, 2 = mastered
+        buckets = np.where(mastery >= 90, 2, np.where(mastery < 70, 0, 1))
+        needs_practice_count, improving_count, mastered_count = np.bincount(buckets, minlength=3)
+        
+        report = {
+            "total_words": len(words),
+            "mastered_words": int(mastered_count),
+            "needs_practice": int(needs_practice_count),
+            "improving_words": int(improving_count)
+        }
+        
+        if include_details:
+            def word_details(bucket):
+                details = {}
+                for i in np.flatnonzero(buckets == bucket):
+                    details[words[i]] = {
+                        "correct_count": int(correct[i]),
+                        "total_count": int(total[i]),
+                        "mastery_level": float(mastery[i]),
+                        "first_seen": self._word_first_seen[i],
+                        "last_seen": self._word_last_seen[i]
                     }
-                
-                all_words[word]["correct_count"] += stats.get("correct_count", 0)
-                all_words[word]["total_count"] += stats.get("total_count", 0)
-                all_words[word]["last_seen"] = session.get("timestamp", "")
-        
-        # Calculate mastery levels
-        for word, stats in all_words.items():
-            if stats["total_count"] > 0:
-                stats["mastery_level"] = (stats["correct_count"] / stats["total_count"]) * 100
-        
-        # Categorize words
-        mastered_words = {word: stats for word, stats in all_words.items() if stats["mastery_level"] >= 90}
-        needs_practice = {word: stats for word, stats in all_words.items() if stats["mastery_level"] < 70}
-        improving_words = {word: stats for word, stats in all_words.items() if 70 <= stats["mastery_level"] < 90}
-        
-        return {
-            "total_words": len(all_words),
-            "mastered_words": len(mastered_words),
-            "needs_practice": len(needs_practice),
-            "improving_words": len(improving_words),
-            "word_details": {
-                "mastered": mastered_words,
-                "needs_practice": needs_practice,
-                "improving": improving_words
+                return details
+            
+            report["word_details"] = {
+                "mastered": word_details(2),
+                "needs_practice": word_details(0),
+                "improving": word_details(1)
             }
-        }
+        
+        self._word_report_cache = (session_count, report)
+        return report
     
     def estimate_reading_level(self) -> str:
         """Estimate current reading level based on performance"""
@@ -188,11 +373,10 @@ class AssessmentEngine:
             return "beginner"
         
         # Get recent performance (last 5 sessions)
-        recent_sessions = self.assessment_data["progress_over_time"][-5:]
-        
-        avg_accuracy = np.mean([s["accuracy"] for s in recent_sessions])
-        avg_wpm = np.mean([s["words_per_minute"] for s in recent_sessions])
-        avg_fluency = np.mean([s["fluency_score"] for s in recent_sessions])
+        columns = self._history_columns("progress_over_time")
+        avg_accuracy = columns["accuracy"][-5:].mean()
+        avg_wpm = columns["words_per_minute"][-5:].mean()
+        avg_fluency = columns["fluency_score"][-5:].mean()
         
         # Reading level criteria
         if avg_accuracy >= 90 and avg_wpm >= 40 and avg_fluency >= 80:
@@ -204,14 +388,23 @@ class AssessmentEngine:
     
     def generate_parent_report(self) -> Dict:
         """Generate comprehensive report for parents"""
-        if not self.assessment_data["reading_sessions"]:
+        sessions = self.assessment_data["reading_sessions"]
+        if not sessions:
             return {"message": "No reading sessions available for report generation"}
         
+        # Reuse the last report until sessions are added or the history is replaced
+        progress = self.assessment_data["progress_over_time"]
+        cache_key = (len(sessions), len(progress))
+        if (self._report_cache and self._report_cache[0] is sessions and self._report_cache[1] is progress
+                and self._report_cache[2] == cache_key):
+            return self._report_cache[3]
+        
         # Calculate overall statistics
-        total_sessions = len(self.assessment_data["reading_sessions"])
-        avg_accuracy = np.mean([s["performance_metrics"]["accuracy"] for s in self.assessment_data["reading_sessions"]])
-        avg_wpm = np.mean([s["performance_metrics"]["words_per_minute"] for s in self.assessment_data["reading_sessions"]])
-        avg_fluency = np.mean([s["performance_metrics"]["fluency_score"] for s in self.assessment_data["reading_sessions"]])
+        total_sessions = len(sessions)
+        columns = self._history_columns()
+        avg_accuracy = columns["accuracy"].mean()
+        avg_wpm = columns["words_per_minute"].mean()
+        avg_fluency = columns["fluency_score"].mean()
         
         # Word mastery report
         word_report = self.generate_word_mastery_report()
@@ -219,11 +412,8 @@ class AssessmentEngine:
         # Current reading level
         current_level = self.estimate_reading_level()
         
-        # Generate charts
-        charts = self.generate_progress_charts()
-        
         # Overall recommendations
-        overall_recommendations = self.generate_overall_recommendations()
+        overall_recommendations = self.generate_overall_recommendations(word_report)
         
         report = {
             "summary": {
@@ -235,46 +425,32 @@ class AssessmentEngine:
             },
             "word_mastery": word_report,
             "recommendations": overall_recommendations,
-            "charts": charts,
             "generated_date": datetime.now().isoformat()
         }
         
+        self._report_cache = (sessions, progress, cache_key, report)
         return report
     
-    def generate_overall_recommendations(self) -> List[str]:
+    def generate_overall_recommendations(self, word_report: Dict = None) -> List[str]:
         """Generate overall recommendations based on all sessions"""
-        recommendations = []
-        
         if not self.assessment_data["reading_sessions"]:
             return ["Start with regular reading sessions to build a foundation"]
         
         # Analyze recent performance
         recent_sessions = self.assessment_data["reading_sessions"][-3:]
-        recent_accuracy = np.mean([s["performance_metrics"]["accuracy"] for s in recent_sessions])
-        recent_wpm = np.mean([s["performance_metrics"]["words_per_minute"] for s in recent_sessions])
-        
-        # Frequency recommendations
-        total_sessions = len(self.assessment_data["reading_sessions"])
-        if total_sessions < 5:
-            recommendations.append("Increase reading frequency to at least 3-4 sessions per week")
-        elif total_sessions < 10:
-            recommendations.append("Good reading frequency! Continue with regular practice")
-        else:
-            recommendations.append("Excellent reading consistency! Consider more challenging texts")
-        
-        # Performance-based recommendations
-        if recent_accuracy < 75:
-            recommendations.append("Focus on accuracy over speed - practice difficult words")
-        elif recent_accuracy > 90:
-            recommendations.append("Excellent accuracy! Ready for more complex vocabulary")
-        
-        if recent_wpm < 20:
-            recommendations.append("Practice reading aloud to improve reading speed")
-        elif recent_wpm > 45:
-            recommendations.append("Great reading speed! Focus on comprehension and expression")
-        
-        # Word mastery recommendations
-        word_report = self.generate_word_mastery_report()
+        recent_accuracy = sum(s["performance_metrics"]["accuracy"] for s in recent_sessions) / len(recent_sessions)
+        recent_wpm = sum(s["performance_metrics"]["words_per_minute"] for s in recent_sessions) / len(recent_sessions)
+        
+        # Frequency- and performance-based recommendations
+        recommendations = _tier_messages(OVERALL_RECOMMENDATION_TIERS, {
+            "total_sessions": len(self.assessment_data["reading_sessions"]),
+            "recent_accuracy": recent_accuracy,
+            "recent_wpm": recent_wpm
+        })
+        
+        # Word mastery recommendations (reuse the caller's report if it has one)
+        if word_report is None:
+            word_report = self.generate_word_mastery_report(include_details=False)
         if word_report["needs_practice"] > 10:
             recommendations.append(f"Focus on practicing {word_report['needs_practice']} words that need more work")
         
@@ -283,11 +459,50 @@ class AssessmentEngine:
     def save_assessment_data(self):
         """Save assessment data to session state"""
         st.session_state["assessment_data"] = self.assessment_data
+        
+        # Bump the revision so loaders can tell when the data actually changed
+        self._loaded_rev = st.session_state.get("assessment_data_rev", 0) + 1
+        st.session_state["assessment_data_rev"] = self._loaded_rev
+    
+    def append_session_record(self, session_analysis: Dict):
+        """Record a completed session and append it to the sessions log"""
+        self.assessment_data["reading_sessions"].append(session_analysis)
+        
+        # One line per session, so a completion never rewrites earlier history
+        try:
+            with open(SESSIONS_LOG, "ab") as f:
+                f.write(orjson.dumps(session_analysis, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n")
+        except OSError as e:
+            st.warning(f"Could not save reading session: {e}")
+        
+        self.save_assessment_data()
+    
+    def load_session_log(self):
+        """Rebuild session history from the sessions log"""
+        try:
+            with open(SESSIONS_LOG, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        
+        for line in lines:
+            try:
+                session_analysis = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue  # Skip a line left partial by an interrupted write
+            self.assessment_data["reading_sessions"].append(session_analysis)
+            self.track_progress_over_time(session_analysis)
     
     def load_assessment_data(self):
-        """Load assessment data from session state"""
+        """Load assessment data from session state, or from the sessions log for a new session"""
+        rev = st.session_state.get("assessment_data_rev", 0)
         if "assessment_data" in st.session_state:
-            self.assessment_data = st.session_state["assessment_data"]
+            if rev != self._loaded_rev:
+                self.assessment_data = st.session_state["assessment_data"]
+                self._loaded_rev = rev
+        else:
+            self.load_session_log()
+            self.save_assessment_data()
 
 if __name__ == "__main__":
     # Test the assessment engine
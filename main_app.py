@@ -1,11 +1,90 @@
 import streamlit as st
 import os
 from datetime import datetime
-import json
-from story_generator import StoryGenerator
-from speech_engine import SpeechRecognitionEngine, WordHighlighter
-from assessment_engine import AssessmentEngine
 import glob
+import copy
+import time
+
+# Session state defaults, applied once per browser session
+_SESSION_DEFAULTS = {
+    "current_story": None,
+    "current_page": 0,
+    "reading_mode": "manual",  # manual, speech
+    "user_type": "child",  # child, parent
+    "reading_level": "beginner",
+    "rewards": {
+        "stars": 0,
+        "badges": [],
+        "streak": 0
+    }
+}
+
+# Progress chart choices in the parent view, mapped to their chart keys
+_PROGRESS_CHART_VIEWS = {
+    "Accuracy": "accuracy",
+    "Speed": "wpm",
+    "Fluency": "fluency",
+    "Words Mastered": "mastered"
+}
+
+# Encouragement after a reading attempt: (minimum accuracy, message, celebrate), best tier first
+_ENCOURAGEMENT_TIERS = (
+    (90, "🌟 Excellent reading! You're doing amazing!", True),
+    (70, "👍 Good job! Keep practicing!", False),
+    (0, "💪 Keep trying! Reading takes practice!", False)
+)
+
+@st.cache_data(ttl=30)
+def _list_story_files():
+    """List saved story files, cached so reruns don't rescan the stories folder"""
+    return [os.path.basename(f) for f in glob.glob('stories/*.json')]
+
+@st.cache_data(max_entries=64)
+def _read_illustration(path: str) -> bytes:
+    """Saved illustration bytes, read from disk once rather than on every rerun"""
+    with open(path, 'rb') as img_file:
+        return img_file.read()
+
+def _metric_row(metrics: list):
+    """Show (label, value) metrics side by side, one column each"""
+    for column, (label, value) in zip(st.columns(len(metrics)), metrics):
+        column.metric(label, value)
+
+# Engines are imported inside their factories, so a session only pays the one-time
+# import cost (Whisper, PyAudio, OpenAI) of the components it actually uses.
+
+@st.cache_resource
+def _get_story_generator():
+    """Story generator shared across sessions; it only holds the OpenAI client"""
+    from story_generator import StoryGenerator
+    return StoryGenerator()
+
+@st.cache_resource
+def _get_word_highlighter():
+    """Word highlighter shared across sessions"""
+    from speech_engine import WordHighlighter
+    return WordHighlighter()
+
+@st.cache_data(max_entries=64)
+def _highlight_text(text: str, word_index: int) -> str:
+    """Highlighted page HTML, built once per (text, word) rather than on every rerun"""
+    return _get_word_highlighter().highlight_word_in_text(text, word_index)
+
+def _create_speech_engine():
+    from speech_engine import SpeechRecognitionEngine
+    return SpeechRecognitionEngine()
+
+def _create_assessment_engine():
+    from assessment_engine import AssessmentEngine
+    engine = AssessmentEngine()
+    engine.load_assessment_data()
+    return engine
+
+def _get_session_engine(key: str, factory):
+    """Get an engine holding per-user state, created once per browser session"""
+    if key not in st.session_state:
+        st.session_state[key] = factory()
+    return st.session_state[key]
 
 class ReadingTeacherApp:
     def __init__(self):
@@ -16,41 +95,34 @@ class ReadingTeacherApp:
             initial_sidebar_state="expanded"
         )
         
-        # Initialize components
-        self.story_generator = StoryGenerator()
-        self.speech_engine = SpeechRecognitionEngine()
-        self.word_highlighter = WordHighlighter()
-        self.assessment_engine = AssessmentEngine()
+        # Initialize components (reused across reruns)
+        self.story_generator = _get_story_generator()
+        self.word_highlighter = _get_word_highlighter()
+        self.assessment_engine = _get_session_engine("assessment_engine", _create_assessment_engine)
         
         # Initialize session state
         self.initialize_session_state()
-        
-        # Load assessment data
-        self.assessment_engine.load_assessment_data()
+    
+    @property
+    def speech_engine(self):
+        """Speech engine, created on first use since it opens the microphone and loads Whisper"""
+        return _get_session_engine("speech_engine", _create_speech_engine)
     
     def initialize_session_state(self):
         """Initialize session state variables"""
-        if "current_story" not in st.session_state:
-            st.session_state.current_story = None
-        if "current_page" not in st.session_state:
-            st.session_state.current_page = 0
-        if "reading_mode" not in st.session_state:
-            st.session_state.reading_mode = "manual"  # manual, speech
-        if "user_type" not in st.session_state:
-            st.session_state.user_type = "child"  # child, parent
-        if "reading_level" not in st.session_state:
-            st.session_state.reading_level = "beginner"
+        if st.session_state.get("session_initialized"):
+            return
+        
+        for key, value in _SESSION_DEFAULTS.items():
+            st.session_state.setdefault(key, copy.deepcopy(value))
         if "session_id" not in st.session_state:
-            st.session_state.session_id = datetime.now().isoformat()
-        if "rewards" not in st.session_state:
-            st.session_state.rewards = {
-                "stars": 0,
-                "badges": [],
-                "streak": 0
-            }
+            st.session_state.session_id = str(time.time_ns())
+        st.session_state.session_initialized = True
     
     def main(self):
         """Main application interface"""
+        state = st.session_state
+        
         # Header
         st.title("📚 Reading Teacher")
         st.markdown("### Your AI-powered reading adventure! 🚀")
@@ -61,12 +133,12 @@ class ReadingTeacherApp:
             user_type = st.selectbox(
                 "I am a:",
                 ["child", "parent"],
-                index=0 if st.session_state.user_type == "child" else 1
+                index=0 if state.user_type == "child" else 1
             )
-            st.session_state.user_type = user_type
+            state.user_type = user_type
         
         # Show pending story editor if needed
-        if st.session_state.get("show_pending_story_editor", False):
+        if state.get("show_pending_story_editor", False):
             self.pending_story_line_editor()
             return
         
@@ -78,6 +150,8 @@ class ReadingTeacherApp:
     
     def child_interface(self):
         """Child-friendly reading interface"""
+        state = st.session_state
+        
         # Sidebar for child
         with st.sidebar:
             st.header("🎯 My Reading Journey")
@@ -86,28 +160,22 @@ class ReadingTeacherApp:
             level = st.selectbox(
                 "Reading Level:",
                 ["beginner", "intermediate", "advanced"],
-                index=["beginner", "intermediate", "advanced"].index(st.session_state.reading_level)
+                index=["beginner", "intermediate", "advanced"].index(state.reading_level)
             )
-            st.session_state.reading_level = level
+            state.reading_level = level
             
-            # Rewards display
+            # Rewards display, in a placeholder so stars awarded later in this run show up right away
             st.subheader("🏆 My Rewards")
-            st.metric("⭐ Stars", st.session_state.rewards["stars"])
-            st.metric("🔥 Streak", st.session_state.rewards["streak"])
-            
-            if st.session_state.rewards["badges"]:
-                st.write("🏅 Badges:")
-                for badge in st.session_state.rewards["badges"]:
-                    st.write(f"  {badge}")
+            self.rewards_display = st.empty()
+            self.render_rewards()
             
             # Quick actions
             st.subheader("🎮 Quick Actions")
             if st.button("🎨 New Story"):
-                st.session_state.show_new_story_form = True
+                state.show_new_story_form = True
             
             # Load existing story
-            story_files = glob.glob('stories/*.json')
-            story_files = [os.path.basename(f) for f in story_files]
+            story_files = _list_story_files()
             if story_files:
                 selected_story = st.selectbox("📂 Load Existing Story:", ["(Select a story)"] + story_files)
                 if selected_story != "(Select a story)":
@@ -119,10 +187,10 @@ class ReadingTeacherApp:
                             st.rerun()
             
             if st.button("📊 My Progress"):
-                st.session_state.show_progress = True
+                state.show_progress = True
         
         # Show new story form if requested
-        if st.session_state.get("show_new_story_form", False):
+        if state.get("show_new_story_form", False):
             self.new_story_form()
             return
         
@@ -143,40 +211,68 @@ class ReadingTeacherApp:
     
     def story_reading_interface(self):
         """Story reading interface with speech recognition"""
+        state = st.session_state
         st.header("�� Read Your Story")
         # Story Line Editor button
         if st.button("✏️ Edit Story Lines"):
-            st.session_state.show_story_editor = True
-        if st.session_state.get("show_story_editor", False):
+            state.show_story_editor = True
+        if state.get("show_story_editor", False):
             self.story_line_editor()
             return
-        if not st.session_state.current_story:
+        story = state.current_story
+        if not story:
             st.info("🎨 Click 'New Story' in the sidebar to start your reading adventure!")
             return
         
-        story = st.session_state.current_story
-        current_page = st.session_state.current_page
-        total_pages = len(story["pages"])
-        
-        if current_page >= total_pages:
+        if state.current_page >= len(story["pages"]):
             st.success("🎉 Congratulations! You finished the story!")
             self.complete_story_session()
             return
         
+        self.render_story_page()
+        
+        # Reading attempts stay outside the fragment: they award stars, which the sidebar must show
+        self.render_reading_options(story["pages"][state.current_page]["text"])
+    
+    def render_rewards(self):
+        """Show the child's stars, streak and badges in the sidebar rewards placeholder"""
+        rewards = st.session_state.rewards
+        with self.rewards_display.container():
+            st.metric("⭐ Stars", rewards["stars"])
+            st.metric("🔥 Streak", rewards["streak"])
+            
+            if rewards["badges"]:
+                st.write("🏅 Badges:")
+                for badge in rewards["badges"]:
+                    st.write(f"  {badge}")
+    
+    @st.fragment
+    def render_story_page(self):
+        """Render the current page in a fragment so page turns only rerun this block"""
+        state = st.session_state
+        pages = state.current_story["pages"]
+        current_page = state.current_page
+        total_pages = len(pages)
+        
         # Get current page
-        page = story["pages"][current_page]
+        page = pages[current_page]
+        illustration_url = page.get("illustration_url")
+        text = page["text"]
         
         # Story page display
         col1, col2 = st.columns([1, 1])
         
         with col1:
             # Story illustration
-            if page.get("illustration_url"):
-                illustration_url = page["illustration_url"]
-                if os.path.exists(illustration_url):
+            if illustration_url:
+                # Saved images come from the in-memory cache; a page whose download failed keeps its URL
+                if illustration_url.startswith(("http://", "https://")):
                     st.image(illustration_url, use_container_width=True)
                 else:
-                    st.image(illustration_url, use_container_width=True)
+                    try:
+                        st.image(_read_illustration(illustration_url), use_container_width=True)
+                    except OSError:
+                        st.info("🎨 Illustration loading...")
             else:
                 st.info("🎨 Illustration loading...")
         
@@ -185,38 +281,42 @@ class ReadingTeacherApp:
             st.subheader(f"Page {current_page + 1} of {total_pages}")
             
             # Display text with word highlighting
-            text = page["text"]
-            highlighted_text = self.word_highlighter.highlight_word_in_text(text, -1)  # No highlighting initially
+            highlighted_text = _highlight_text(text, -1)  # No highlighting initially
             st.markdown(f"<div style='font-size: 24px; line-height: 1.5;'>{highlighted_text}</div>", unsafe_allow_html=True)
             
-            # Reading controls
-            st.subheader("🎤 Reading Options")
-            
-            col_a, col_b = st.columns(2)
-            with col_a:
-                if st.button("🎤 Start Reading", type="primary"):
-                    self.start_speech_reading(text)
-            
-            with col_b:
-                if st.button("🔊 Hear Word"):
-                    self.play_word_pronunciation(text)
-            
             # Navigation
             st.subheader("📄 Navigation")
             nav_col1, nav_col2, nav_col3 = st.columns(3)
             
             with nav_col1:
-                if st.button("⬅️ Previous") and current_page > 0:
-                    st.session_state.current_page -= 1
-                    st.rerun()
+                # Page turns happen in a callback, before the fragment reruns, so no extra rerun is needed
+                st.button("⬅️ Previous", on_click=self.turn_page, args=(-1,))
             
             with nav_col2:
                 st.write(f"Page {current_page + 1}")
             
             with nav_col3:
-                if st.button("➡️ Next") and current_page < total_pages - 1:
-                    st.session_state.current_page += 1
-                    st.rerun()
+                st.button("➡️ Next", on_click=self.turn_page, args=(1,))
+    
+    def render_reading_options(self, text: str):
+        """Reading controls for the current page, run as part of the full app so rewards stay in sync"""
+        st.subheader("🎤 Reading Options")
+        
+        col_a, col_b = st.columns(2)
+        with col_a:
+            if st.button("🎤 Start Reading", type="primary"):
+                self.start_speech_reading(text)
+        
+        with col_b:
+            if st.button("🔊 Hear Word"):
+                self.play_word_pronunciation(text)
+    
+    def turn_page(self, step: int):
+        """Move to the previous or next page, staying within the story"""
+        state = st.session_state
+        new_page = state.current_page + step
+        if 0 <= new_page < len(state.current_story["pages"]):
+            state.current_page = new_page
     
     def start_speech_reading(self, text: str):
         """Start speech recognition for reading"""
@@ -230,7 +330,7 @@ class ReadingTeacherApp:
         
         if audio:
             # Transcribe audio
-            spoken_text = self.speech_engine.transcribe_audio(audio)
+            spoken_text = self.speech_engine.transcribe_audio(audio, text)
             
             if spoken_text:
                 st.success(f"🎤 You said: '{spoken_text}'")
@@ -256,16 +356,11 @@ class ReadingTeacherApp:
         """Display reading performance results"""
         st.subheader("📊 Reading Results")
         
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric("Accuracy", f"{performance['accuracy']:.1f}%")
-        
-        with col2:
-            st.metric("Speed", f"{performance['words_per_minute']:.1f} WPM")
-        
-        with col3:
-            st.metric("Fluency", f"{performance['fluency_score']:.1f}%")
+        _metric_row([
+            ("Accuracy", f"{performance['accuracy']:.1f}%"),
+            ("Speed", f"{performance['words_per_minute']:.1f} WPM"),
+            ("Fluency", f"{performance['fluency_score']:.1f}%")
+        ])
         
         # Show mistakes if any
         if alignment["incorrect_words"]:
@@ -274,21 +369,25 @@ class ReadingTeacherApp:
                 st.write(f"  • '{mistake['word']}' (you said: '{mistake['spoken']}')")
         
         # Encouragement
-        if performance["accuracy"] >= 90:
-            st.success("🌟 Excellent reading! You're doing amazing!")
-            st.balloons()
-        elif performance["accuracy"] >= 70:
-            st.info("👍 Good job! Keep practicing!")
-        else:
-            st.info("💪 Keep trying! Reading takes practice!")
+        accuracy = performance["accuracy"]
+        for threshold, message, celebrate in _ENCOURAGEMENT_TIERS:
+            if accuracy >= threshold:
+                (st.success if celebrate else st.info)(message)
+                # Celebrate each reading attempt once, even if its results are shown again
+                if celebrate and st.session_state.get("balloons_shown_for") != performance.get("timestamp_ns"):
+                    st.balloons()
+                    st.session_state.balloons_shown_for = performance.get("timestamp_ns")
+                break
     
     def award_points(self, accuracy: float):
         """Award points based on reading performance"""
         points = int(accuracy / 10)  # 1 point per 10% accuracy
-        st.session_state.rewards["stars"] += points
-        st.session_state.rewards["streak"] += 1
+        rewards = st.session_state.rewards
+        rewards["stars"] += points
+        rewards["streak"] += 1
+        self.render_rewards()
         
-        st.success(f"⭐ You earned {points} stars! Total: {st.session_state.rewards['stars']}")
+        st.success(f"⭐ You earned {points} stars! Total: {rewards['stars']}")
     
     def play_word_pronunciation(self, text: str):
         """Play word pronunciation (placeholder)"""
@@ -308,6 +407,8 @@ class ReadingTeacherApp:
         story = self.story_generator.create_complete_story(st.session_state.reading_level, theme)
         
         if story:
+            _list_story_files.clear()
+            _read_illustration.clear()
             self.story_generator.save_story_to_session(story)
             st.success(f"🎉 Your story '{story['title']}' is ready!")
             st.rerun()
@@ -326,16 +427,11 @@ class ReadingTeacherApp:
         if "reading_performance" in st.session_state:
             performance = st.session_state.reading_performance
             
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("Words Mastered", len(performance.get("words_read", {})))
-            
-            with col2:
-                st.metric("Reading Sessions", len(self.assessment_engine.assessment_data["reading_sessions"]))
-            
-            with col3:
-                st.metric("Current Streak", st.session_state.rewards["streak"])
+            _metric_row([
+                ("Words Mastered", len(performance.get("words_read", {}))),
+                ("Reading Sessions", len(self.assessment_engine.assessment_data["reading_sessions"])),
+                ("Current Streak", st.session_state.rewards["streak"])
+            ])
         else:
             st.info("📚 Start reading to see your progress!")
     
@@ -375,53 +471,25 @@ class ReadingTeacherApp:
         st.subheader("📊 Reading Summary")
         summary = report["summary"]
         
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Sessions", summary["total_sessions"])
-        
-        with col2:
-            st.metric("Reading Level", summary["current_reading_level"].title())
-        
-        with col3:
-            st.metric("Average Accuracy", f"{summary['average_accuracy']}%")
-        
-        with col4:
-            st.metric("Average Speed", f"{summary['average_speed']} WPM")
+        _metric_row([
+            ("Total Sessions", summary["total_sessions"]),
+            ("Reading Level", summary["current_reading_level"].title()),
+            ("Average Accuracy", f"{summary['average_accuracy']}%"),
+            ("Average Speed", f"{summary['average_speed']} WPM")
+        ])
         
         # Progress charts
-        st.subheader("📈 Progress Over Time")
-        charts = report["charts"]
-        
-        if charts:
-            tab1, tab2, tab3, tab4 = st.tabs(["Accuracy", "Speed", "Fluency", "Words Mastered"])
-            
-            with tab1:
-                st.plotly_chart(charts["accuracy"], use_container_width=True)
-            
-            with tab2:
-                st.plotly_chart(charts["wpm"], use_container_width=True)
-            
-            with tab3:
-                st.plotly_chart(charts["fluency"], use_container_width=True)
-            
-            with tab4:
-                st.plotly_chart(charts["mastered"], use_container_width=True)
+        self.render_progress_charts()
         
         # Word mastery report
         st.subheader("📚 Word Mastery")
         word_report = report["word_mastery"]
         
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric("Total Words", word_report["total_words"])
-        
-        with col2:
-            st.metric("Mastered Words", word_report["mastered_words"])
-        
-        with col3:
-            st.metric("Need Practice", word_report["needs_practice"])
+        _metric_row([
+            ("Total Words", word_report["total_words"]),
+            ("Mastered Words", word_report["mastered_words"]),
+            ("Need Practice", word_report["needs_practice"])
+        ])
         
         # Recommendations
         st.subheader("💡 Recommendations")
@@ -430,6 +498,17 @@ class ReadingTeacherApp:
         for i, rec in enumerate(recommendations, 1):
             st.write(f"{i}. {rec}")
     
+    @st.fragment
+    def render_progress_charts(self):
+        """Render progress charts in a fragment so chart interactions only rerun this block"""
+        st.subheader("📈 Progress Over Time")
+        charts = self.assessment_engine.generate_progress_charts()
+        
+        if charts:
+            # Only the selected chart is sent to the browser; tabs would render all four
+            view = st.radio("Metric", list(_PROGRESS_CHART_VIEWS), horizontal=True, label_visibility="collapsed")
+            st.plotly_chart(charts[_PROGRESS_CHART_VIEWS[view]], use_container_width=True)
+    
     def complete_story_session(self):
         """Complete a story reading session"""
         if not st.session_state.current_story:
@@ -441,8 +520,7 @@ class ReadingTeacherApp:
             "timestamp": datetime.now().isoformat(),
             "reading_level": st.session_state.reading_level,
             "story_title": st.session_state.current_story["title"],
-            "performance": self.speech_engine.reading_performance,
-            "words_read": self.speech_engine.reading_performance["words_read"]
+            "performance": self.speech_engine.reading_performance
         }
         
         # Analyze session
@@ -451,8 +529,8 @@ class ReadingTeacherApp:
         # Track progress
         self.assessment_engine.track_progress_over_time(session_analysis)
         
-        # Save to session state
-        self.assessment_engine.save_assessment_data()
+        # Record the session
+        self.assessment_engine.append_session_record(session_analysis)
         
         st.success("🎉 Story completed! Great job reading!")
         st.balloons()
@@ -461,33 +539,49 @@ class ReadingTeacherApp:
         """Show an editor for all story lines and illustration prompts, indexed by page number."""
         story = st.session_state.current_story
         st.subheader("📝 Story Line Editor")
-        edited = False
-        for i, page in enumerate(story["pages"]):
+        # Only the selected page's widgets are built, instead of two text areas per page
+        i = st.selectbox(
+            "Page to edit:",
+            range(len(story["pages"])),
+            format_func=lambda n: f"Page {n+1}"
+        )
+        page = story["pages"][i]
+        # Text areas inside a form only rerun the script on submit, not on every keystroke
+        with st.form("story_line_editor_form"):
             st.markdown(f"**Page {i+1}:**")
             new_text = st.text_area(f"Story Text (Page {i+1})", value=page["text"], key=f"edit_text_{i}")
             new_prompt = st.text_area(f"Illustration Prompt (Page {i+1})", value=page.get("illustration_prompt", ""), key=f"edit_prompt_{i}")
-            if new_text != page["text"] or new_prompt != page.get("illustration_prompt", ""):
-                page["text"] = new_text
-                page["illustration_prompt"] = new_prompt
-                edited = True
+            save_clicked = st.form_submit_button("💾 Save Edits")
+        if save_clicked:
+            # Apply the edits only on submit; keep the editor open so other pages can be edited next
+            page["text"] = new_text
+            page["illustration_prompt"] = new_prompt
+            self.story_generator.save_story_to_session(story)
+            self.story_generator.save_story_to_file(story)
+            _list_story_files.clear()
+            st.success(f"Page {i+1} edits saved!")
+        only_changed = st.checkbox("Only re-draw pages whose illustration prompt changed", value=True)
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("💾 Save Edits"):
-                self.story_generator.save_story_to_session(story)
-                self.story_generator.save_story_to_file(story)
-                st.success("Story edits saved!")
-                st.session_state.show_story_editor = False
-                st.rerun()
-        with col2:
             if st.button("🎨 Re-generate Images (New Version)"):
-                new_story = self.story_generator.regenerate_images_for_story(story)
-                self.story_generator.save_story_to_session(new_story)
-                st.success("Images re-generated and saved as a new version!")
+                new_story, targets, redrawn = self.story_generator.regenerate_images_for_story(story, only_changed=only_changed)
+                if not targets:
+                    st.info("Every page already matches its illustration prompt, so nothing was re-drawn.")
+                elif not redrawn:
+                    st.error("😕 None of the images could be re-drawn right now. Try again in a little while!")
+                else:
+                    self.story_generator.save_story_to_session(new_story)
+                    if len(redrawn) < len(targets):
+                        # Stay in the editor so the warning stays visible and the missed pages can be retried
+                        st.warning(f"Re-drew {len(redrawn)} of {len(targets)} pages; the rest keep their earlier images.")
+                    else:
+                        st.success("Images re-generated and saved as a new version!")
+                        st.session_state.show_story_editor = False
+                        st.rerun()
+        with col2:
+            if st.button("❌ Close Editor"):
                 st.session_state.show_story_editor = False
                 st.rerun()
-        if st.button("❌ Close Editor"):
-            st.session_state.show_story_editor = False
-            st.rerun()
 
     def new_story_form(self):
         """Interactive form for new story creation: theme, genre, and custom outline."""
@@ -519,35 +613,35 @@ class ReadingTeacherApp:
         """Show the story line editor for a pending new story outline before images are generated."""
         story = st.session_state.pending_story_outline
         st.subheader("📝 Review and Edit Your Story Outline")
-        for i, page in enumerate(story["pages"]):
-            st.markdown(f"**Page {i+1}:**")
-            new_text = st.text_area(f"Story Text (Page {i+1})", value=page["text"], key=f"pending_edit_text_{i}")
-            new_prompt = st.text_area(f"Illustration Prompt (Page {i+1})", value=page.get("illustration_prompt", ""), key=f"pending_edit_prompt_{i}")
-            page["text"] = new_text
-            page["illustration_prompt"] = new_prompt
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("✅ Accept and Generate Images"):
-                # Now save and generate images
-                final_story = self.story_generator.create_complete_story(
-                    story["reading_level"],
-                    theme=story["theme"],
-                    genre=story.get("genre", ""),
-                    user_outline=""
-                )
-                if final_story:
-                    self.story_generator.save_story_to_session(final_story)
-                    st.success(f"🎉 Your story '{final_story['title']}' is ready!")
-                    st.session_state.show_pending_story_editor = False
-                    st.session_state.pending_story_outline = None
-                    st.rerun()
-                else:
-                    st.error("😕 Sorry, I couldn't create the full story right now. Try again!")
-        with col2:
-            if st.button("❌ Cancel"):
+        # Text areas inside a form only rerun the script on submit, not on every keystroke
+        with st.form("pending_story_line_editor_form"):
+            for i, page in enumerate(story["pages"]):
+                st.markdown(f"**Page {i+1}:**")
+                st.text_area(f"Story Text (Page {i+1})", value=page["text"], key=f"pending_edit_text_{i}")
+                st.text_area(f"Illustration Prompt (Page {i+1})", value=page.get("illustration_prompt", ""), key=f"pending_edit_prompt_{i}")
+            accept_clicked = st.form_submit_button("✅ Accept and Generate Images")
+        if accept_clicked:
+            # Collect the edits once, on submit
+            for i, page in enumerate(story["pages"]):
+                page["text"] = st.session_state[f"pending_edit_text_{i}"]
+                page["illustration_prompt"] = st.session_state[f"pending_edit_prompt_{i}"]
+            # Now save and illustrate the edited outline (no second outline request)
+            final_story = self.story_generator.illustrate_story(story)
+            # illustrate_story always returns the story; it failed if no page got a picture
+            if any(page.get("illustration_url") for page in final_story["pages"]):
+                _list_story_files.clear()
+                _read_illustration.clear()
+                self.story_generator.save_story_to_session(final_story)
+                st.success(f"🎉 Your story '{final_story['title']}' is ready!")
                 st.session_state.show_pending_story_editor = False
                 st.session_state.pending_story_outline = None
                 st.rerun()
+            else:
+                st.error("😕 Sorry, I couldn't create the full story right now. Try again!")
+        if st.button("❌ Cancel"):
+            st.session_state.show_pending_story_editor = False
+            st.session_state.pending_story_outline = None
+            st.rerun()
 
 if __name__ == "__main__":
     app = ReadingTeacherApp()
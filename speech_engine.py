@@ -1,22 +1,51 @@
 import streamlit as st
-import speech_recognition as sr
-import whisper
 import time
 import json
 from typing import List, Dict, Tuple
 import threading
 import queue
 import numpy as np
-from datetime import datetime
+import re
+import difflib
+
+# speech_recognition, whisper and torch are imported inside the code that uses them, so
+# importing this module for WordHighlighter alone doesn't load the speech stack
+
+# Sample rate Whisper models are trained on
+WHISPER_SAMPLE_RATE = 16000
+
+# Word tokenizer compiled once; matching only word characters means punctuation never
+# causes a mismatch, and apostrophes are kept so contractions stay whole
+WORD_PATTERN = re.compile(r"[\w']+")
+
+# Story text often uses the typographic apostrophe, while recognizers return a plain one
+_APOSTROPHES = str.maketrans({"\u2019": "'"})
+
+def _words(text: str) -> List[str]:
+    """Lowercase words of a text, with curly apostrophes normalized so contractions match either way"""
+    return WORD_PATTERN.findall(text.lower().translate(_APOSTROPHES))
+
+@st.cache_resource
+def _load_whisper_model(name: str = "base"):
+    """Whisper model shared across engines and sessions; weights load once per process"""
+    import whisper
+    return whisper.load_model(name)
+
+# Whisper installs per-call kv-cache hooks on the model, so transcriptions on the
+# shared model must run one at a time
+_WHISPER_LOCK = threading.Lock()
 
 class SpeechRecognitionEngine:
     def __init__(self):
+        import speech_recognition as sr
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        # Capture at Whisper's rate so utterances never need resampling
+        self.microphone = sr.Microphone(sample_rate=WHISPER_SAMPLE_RATE, chunk_size=1600)
+        self.noise_calibrated = False
         
         # Initialize Whisper model for better accuracy
         try:
-            self.whisper_model = whisper.load_model("base")
+            self.whisper_model = _load_whisper_model("base")
         except Exception as e:
             st.warning(f"Whisper model not loaded: {e}")
             self.whisper_model = None
@@ -33,17 +62,30 @@ class SpeechRecognitionEngine:
             "fluency_score": 0
         }
         
+        # Per-word counts as parallel arrays indexed by word id
+        self._reset_word_stats()
+        
+        # Page text last aligned against and its word matcher, kept across reading attempts
+        self._alignment_text = None
+        self._alignment_matcher = None
+        
         # Audio processing queue
         self.audio_queue = queue.Queue()
         self.is_listening = False
     
     def adjust_for_ambient_noise(self):
-        """Adjust microphone for ambient noise"""
+        """Adjust microphone for ambient noise, once per engine"""
+        # Later listens keep adapting through the recognizer's dynamic energy threshold,
+        # so recalibrating would only add a second of dead air before each attempt
+        if self.noise_calibrated:
+            return
         with self.microphone as source:
             self.recognizer.adjust_for_ambient_noise(source, duration=1)
+        self.noise_calibrated = True
     
     def listen_for_speech(self, timeout=5):
         """Listen for speech input"""
+        import speech_recognition as sr
         try:
             with self.microphone as source:
                 audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=10)
@@ -54,36 +96,59 @@ class SpeechRecognitionEngine:
             st.error(f"Error listening for speech: {e}")
             return None
     
-    def transcribe_audio(self, audio) -> str:
-        """Transcribe audio using multiple methods for better accuracy"""
-        transcriptions = []
-        
-        # Try Google Speech Recognition
-        try:
-            text = self.recognizer.recognize_google(audio)
-            transcriptions.append(text.lower())
-        except Exception as e:
-            pass
-        
-        # Try Whisper if available
+    def transcribe_audio(self, audio, target_text: str = "") -> str:
+        """Transcribe audio with Whisper, falling back to Google Speech Recognition"""
+        # Try Whisper first; it runs locally, with no network round trip
         if self.whisper_model:
             try:
-                # Convert audio to format Whisper can process
-                audio_data = np.frombuffer(audio.frame_data, dtype=np.int16)
-                result = self.whisper_model.transcribe(audio_data)
-                transcriptions.append(result["text"].lower())
+                import torch
+                # Whisper expects 16 kHz mono float32 in [-1, 1]; the microphone already
+                # records 16 kHz mono, so this only converts if the clip came from elsewhere
+                raw_audio = audio.get_raw_data(convert_rate=WHISPER_SAMPLE_RATE, convert_width=2)
+                audio_data = np.frombuffer(raw_audio, dtype=np.int16).astype(np.float32)
+                audio_data *= 1 / 32768.0  # Scale in place rather than allocating a second array
+                # Hand Whisper a tensor on the model's device so the mel spectrogram is computed there too
+                audio_tensor = torch.from_numpy(audio_data).to(self.whisper_model.device)
+                # Hint the page's vocabulary (not the sentence itself, so Whisper
+                # doesn't just complete the text the child was supposed to read)
+                page_words = dict.fromkeys(_words(target_text))
+                vocabulary_hint = f"Vocabulary: {', '.join(page_words)}." if page_words else None
+                # Short English utterances: greedy decoding, no temperature fallback passes
+                with _WHISPER_LOCK, torch.inference_mode():
+                    result = self.whisper_model.transcribe(
+                        audio_tensor,
+                        initial_prompt=vocabulary_hint,
+                        language="en",
+                        temperature=0.0,
+                        condition_on_previous_text=False,
+                        fp16=self.whisper_model.device.type == "cuda"
+                    )
+                text = result["text"].strip()
+                if text:
+                    return text.lower()
             except Exception as e:
                 pass
         
-        # Return the best transcription
-        if transcriptions:
-            return transcriptions[0]
-        return ""
+        # Fall back to Google Speech Recognition only if Whisper gave nothing
+        try:
+            return self.recognizer.recognize_google(audio).lower()
+        except Exception as e:
+            return ""
+    
+    def _target_matcher(self, target_text: str) -> difflib.SequenceMatcher:
+        """Matcher over the page's words, reused across attempts at the same page"""
+        # Tokenizing the page and indexing its words only needs to happen when the page changes
+        if target_text != self._alignment_text:
+            target_words = _words(target_text)
+            self._alignment_matcher = difflib.SequenceMatcher(b=target_words, autojunk=False)
+            self._alignment_text = target_text
+        return self._alignment_matcher
     
     def align_words_with_text(self, spoken_text: str, target_text: str) -> Dict:
         """Align spoken words with target text for word-level tracking"""
-        spoken_words = spoken_text.split()
-        target_words = target_text.lower().split()
+        spoken_words = _words(spoken_text)
+        matcher = self._target_matcher(target_text)
+        target_words = matcher.b
         
         alignment = {
             "correct_words": [],
@@ -92,61 +157,66 @@ class SpeechRecognitionEngine:
             "extra_words": []
         }
         
-        # Simple word-by-word comparison
-        for i, target_word in enumerate(target_words):
-            if i < len(spoken_words):
-                spoken_word = spoken_words[i]
-                if spoken_word == target_word:
-                    alignment["correct_words"].append({
-                        "word": target_word,
-                        "position": i,
-                        "correct": True
-                    })
-                else:
-                    alignment["incorrect_words"].append({
-                        "word": target_word,
-                        "spoken": spoken_word,
-                        "position": i,
-                        "correct": False
-                    })
-            else:
-                alignment["missed_words"].append({
-                    "word": target_word,
-                    "position": i
-                })
-        
-        # Check for extra words
-        if len(spoken_words) > len(target_words):
-            for word in spoken_words[len(target_words):]:
-                alignment["extra_words"].append(word)
+        # Align on the longest matching runs so one skipped or inserted word
+        # doesn't shift every later word out of place
+        matcher.set_seq1(spoken_words)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                alignment["correct_words"].extend(
+                    {"word": target_words[j], "position": j, "correct": True} for j in range(j1, j2)
+                )
+            elif tag == "replace":
+                # Pair substitutions word for word; any surplus is missed or extra
+                paired = min(i2 - i1, j2 - j1)
+                alignment["incorrect_words"].extend(
+                    {"word": target_words[j1 + k], "spoken": spoken_words[i1 + k], "position": j1 + k, "correct": False}
+                    for k in range(paired)
+                )
+                alignment["missed_words"].extend(
+                    {"word": target_words[j], "position": j} for j in range(j1 + paired, j2)
+                )
+                alignment["extra_words"].extend(spoken_words[i1 + paired:i2])
+            elif tag == "insert":
+                alignment["missed_words"].extend(
+                    {"word": target_words[j], "position": j} for j in range(j1, j2)
+                )
+            else:  # delete
+                alignment["extra_words"].extend(spoken_words[i1:i2])
         
         return alignment
     
     def analyze_reading_performance(self, alignment: Dict, reading_time: float) -> Dict:
         """Analyze reading performance based on word alignment"""
-        total_words = len(alignment["correct_words"]) + len(alignment["incorrect_words"]) + len(alignment["missed_words"])
         correct_words = len(alignment["correct_words"])
+        mistakes = len(alignment["incorrect_words"])
+        missed_words = len(alignment["missed_words"])
+        total_words = correct_words + mistakes + missed_words
         
         performance = {
             "accuracy": (correct_words / total_words * 100) if total_words > 0 else 0,
             "words_per_minute": (total_words / reading_time * 60) if reading_time > 0 else 0,
-            "mistakes": len(alignment["incorrect_words"]),
-            "missed_words": len(alignment["missed_words"]),
+            "mistakes": mistakes,
+            "missed_words": missed_words,
             "extra_words": len(alignment["extra_words"]),
-            "fluency_score": self.calculate_fluency_score(alignment, reading_time),
-            "timestamp": datetime.now().isoformat()
+            "fluency_score": self._fluency_score(correct_words, total_words, reading_time),
+            # Identifies this attempt; it is never shown or saved, so no wall-clock formatting is needed
+            "timestamp_ns": time.monotonic_ns()
         }
         
         return performance
     
     def calculate_fluency_score(self, alignment: Dict, reading_time: float) -> float:
         """Calculate a fluency score based on accuracy and speed"""
-        total_words = len(alignment["correct_words"]) + len(alignment["incorrect_words"]) + len(alignment["missed_words"])
-        
+        correct_words = len(alignment["correct_words"])
+        total_words = correct_words + len(alignment["incorrect_words"]) + len(alignment["missed_words"])
+        return self._fluency_score(correct_words, total_words, reading_time)
+    
+    def _fluency_score(self, correct_words: int, total_words: int, reading_time: float) -> float:
+        """Fluency score (0-100) from word counts and reading time"""
         if total_words == 0 or reading_time == 0:
             return 0
         
-        accuracy = len(alignment["correct_words"]) / total_words
+        accuracy = correct_words / total_words
         words_per_minute = total_words / reading_time * 60
         
         # Ideal reading speed for 5-year-olds: 20-40 words per minute
@@ -156,57 +226,74 @@ class SpeechRecognitionEngine:
         fluency_score = (accuracy * 0.7) + (speed_score * 0.3)
         return fluency_score * 100
     
+    def _reset_word_stats(self):
+        """Clear the per-word count arrays"""
+        self._word_ids = {}
+        self._word_list = []
+        self._correct_counts = np.zeros(0, dtype=np.int32)
+        self._total_counts = np.zeros(0, dtype=np.int32)
+        self._mastery_cache = None
+    
+    def _word_id(self, word: str) -> int:
+        """Get a word's index into the count arrays, registering new words"""
+        idx = self._word_ids.get(word)
+        if idx is None:
+            idx = self._word_ids[word] = len(self._word_list)
+            self._word_list.append(word)
+        return idx
+    
+    def _word_mastery(self) -> np.ndarray:
+        """Mastery level (0-100) of every tracked word, in first-seen order"""
+        # Computed once per update, so both getters share a single pass over the counts
+        if self._mastery_cache is None:
+            word_count = len(self._word_list)
+            self._mastery_cache = self._correct_counts[:word_count] / self._total_counts[:word_count] * 100
+        return self._mastery_cache
+    
     def track_word_mastery(self, alignment: Dict):
         """Track individual word mastery for adaptive learning"""
-        for word_data in alignment["correct_words"]:
-            word = word_data["word"]
-            if word not in self.reading_performance["words_read"]:
-                self.reading_performance["words_read"][word] = {
-                    "correct_count": 0,
-                    "total_count": 0,
-                    "mastery_level": 0
-                }
-            
-            self.reading_performance["words_read"][word]["correct_count"] += 1
-            self.reading_performance["words_read"][word]["total_count"] += 1
-            
-            # Calculate mastery level (0-100)
-            word_stats = self.reading_performance["words_read"][word]
-            word_stats["mastery_level"] = (word_stats["correct_count"] / word_stats["total_count"]) * 100
+        correct_words = [word_data["word"] for word_data in alignment["correct_words"]]
+        attempted_words = correct_words + [mistake["word"] for mistake in alignment["incorrect_words"]]
+        if not attempted_words:
+            return
         
-        # Track mistakes for words needing more practice
-        for mistake in alignment["incorrect_words"]:
-            word = mistake["word"]
-            if word not in self.reading_performance["words_read"]:
-                self.reading_performance["words_read"][word] = {
-                    "correct_count": 0,
-                    "total_count": 0,
-                    "mastery_level": 0
-                }
-            
-            self.reading_performance["words_read"][word]["total_count"] += 1
-            word_stats = self.reading_performance["words_read"][word]
-            word_stats["mastery_level"] = (word_stats["correct_count"] / word_stats["total_count"]) * 100
+        ids = np.fromiter((self._word_id(word) for word in attempted_words), dtype=np.intp, count=len(attempted_words))
+        
+        # Grow the count arrays in chunks so most updates don't reallocate
+        old_capacity = len(self._total_counts)
+        if len(self._word_list) > old_capacity:
+            capacity = (len(self._word_list) // 256 + 1) * 256
+            # np.resize fills new slots by repeating the data, so clear them
+            self._correct_counts = np.resize(self._correct_counts, capacity)
+            self._total_counts = np.resize(self._total_counts, capacity)
+            self._correct_counts[old_capacity:] = 0
+            self._total_counts[old_capacity:] = 0
+        
+        # Unbuffered adds, since a word can appear more than once on a page
+        np.add.at(self._total_counts, ids, 1)
+        np.add.at(self._correct_counts, ids[:len(correct_words)], 1)
+        self._mastery_cache = None
+        
+        # Refresh the per-word stats of the words just read; mastery level is 0-100
+        touched = np.unique(ids)
+        correct_counts = self._correct_counts[touched]
+        total_counts = self._total_counts[touched]
+        mastery = correct_counts / total_counts * 100
+        words_read = self.reading_performance["words_read"]
+        for idx, correct, total, level in zip(touched.tolist(), correct_counts.tolist(), total_counts.tolist(), mastery.tolist()):
+            words_read[self._word_list[idx]] = {
+                "correct_count": correct,
+                "total_count": total,
+                "mastery_level": level
+            }
     
     def get_words_needing_practice(self, threshold: float = 70.0) -> List[str]:
         """Get words that need more practice based on mastery level"""
-        words_needing_practice = []
-        
-        for word, stats in self.reading_performance["words_read"].items():
-            if stats["mastery_level"] < threshold:
-                words_needing_practice.append(word)
-        
-        return words_needing_practice
+        return [self._word_list[idx] for idx in np.flatnonzero(self._word_mastery() < threshold)]
     
     def get_mastered_words(self, threshold: float = 90.0) -> List[str]:
         """Get words that are mastered based on mastery level"""
-        mastered_words = []
-        
-        for word, stats in self.reading_performance["words_read"].items():
-            if stats["mastery_level"] >= threshold:
-                mastered_words.append(word)
-        
-        return mastered_words
+        return [self._word_list[idx] for idx in np.flatnonzero(self._word_mastery() >= threshold)]
     
     def reset_performance_tracking(self):
         """Reset performance tracking for a new reading session"""
@@ -218,6 +305,7 @@ class SpeechRecognitionEngine:
             "accuracy": 0,
             "fluency_score": 0
         }
+        self._reset_word_stats()
     
     def save_performance_to_session(self):
         """Save reading performance to session state"""
@@ -238,14 +326,13 @@ class WordHighlighter:
         if word_index >= len(words):
             return text
         
-        highlighted_words = []
-        for i, word in enumerate(words):
-            if i == word_index:
-                highlighted_words.append(f'<span style="background-color: {self.highlight_color}; padding: 2px 4px; border-radius: 3px;">{word}</span>')
-            else:
-                highlighted_words.append(word)
+        # No word selected: just the normalized text, without building a list of spans
+        if word_index < 0:
+            return " ".join(words)
         
-        return " ".join(highlighted_words)
+        # Wrap only the selected word; the words around it are joined as they are
+        words[word_index] = f'<span style="background-color: {self.highlight_color}; padding: 2px 4px; border-radius: 3px;">{words[word_index]}</span>'
+        return " ".join(words)
     
     def reset_highlight(self):
         """Reset word highlighting"""
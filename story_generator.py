@@ -1,32 +1,201 @@
 import streamlit as st
 import os
-from openai import OpenAI
+from openai import OpenAI, DefaultHttpxClient, RateLimitError, InternalServerError
+import httpx
 import json
+import orjson
 from typing import List, Dict, Tuple
 import base64
 from PIL import Image
 import io
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
+import hashlib
+import shutil
+import threading
+import warnings
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Concurrent DALL-E requests per story, kept modest to stay under API rate limits;
+# accounts on a higher rate-limit tier can raise it with IMAGE_WORKERS
+def _image_workers() -> int:
+    """Worker count from IMAGE_WORKERS, falling back to 8 rather than failing the import on a bad value"""
+    value = os.environ.get("IMAGE_WORKERS", "8")
+    try:
+        return max(1, int(value))
+    except ValueError:
+        warnings.warn(f"IMAGE_WORKERS={value!r} is not a whole number; using 8 image workers")
+        return 8
+
+MAX_IMAGE_WORKERS = _image_workers()
+
+# Attempts after the first for a throttled or failed API call or image download
+API_RETRIES = 4
+
+# Total time one page's illustration request may take across retries, in seconds; the same
+# bound a single request had before retries, so a stalled page still can't hold a worker
+IMAGE_REQUEST_BUDGET = 120.0
+
+# A short structured outline doesn't need the full-size model; OUTLINE_MODEL overrides it
+OUTLINE_MODEL = os.environ.get("OUTLINE_MODEL", "gpt-4o-mini")
+
+# Output cap for one outline, with headroom over a full 15-page story
+OUTLINE_MAX_TOKENS = 2000
+
+# Instructions shared by every outline request, sent first and unchanged so the
+# API's automatic prompt caching can reuse them across calls
+OUTLINE_INSTRUCTIONS = """Create a short story outline for a 5-year-old child at the reading level given below.
+
+Requirements:
+- Use primarily the listed words
+- Follow the given theme, and the genre and user outline when provided
+- Story should be about 15 pages long
+- Each page should have 1-2 simple sentences
+- Include repetition of key words for practice
+- Make it engaging and fun
+
+Return the outline as JSON with this structure:
+{
+    "title": "Story Title",
+    "theme": "<theme>",
+    "reading_level": "<reading level>",
+    "pages": [
+        {
+            "page_number": 1,
+            "text": "Simple sentence here.",
+            "key_words": ["word1", "word2"],
+            "illustration_prompt": "Description for DALL-E to create child-friendly illustration"
+        }
+    ]
+}
+
+IMPORTANT: Return ONLY valid JSON, no additional text or explanations."""
+
+# Every page object in a streamed outline carries this key once, so counting it tracks progress
+PAGE_MARKER = '"page_number"'
+
+# Structured Outputs schema the outline reply is constrained to, so every page
+# arrives with all of the fields the reader and illustrator rely on
+OUTLINE_SCHEMA = {
+    "name": "story_outline",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "theme": {"type": "string"},
+            "reading_level": {"type": "string"},
+            "pages": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "page_number": {"type": "integer"},
+                        "text": {"type": "string"},
+                        "key_words": {"type": "array", "items": {"type": "string"}},
+                        "illustration_prompt": {"type": "string"}
+                    },
+                    "required": ["page_number", "text", "key_words", "illustration_prompt"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["title", "theme", "reading_level", "pages"],
+        "additionalProperties": False
+    }
+}
+
+# Downloaded illustrations keyed by a hash of the prompt that produced them
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"
+IMAGE_QUALITY = "standard"
+IMAGE_CACHE_DIR = os.path.join('stories', '.image_cache')
+
+# Characters dropped from a title when naming its files: anything but letters, digits, spaces, '_' and '-'
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w -]')
+
+# Regenerated image sets live in v2, v3, ... subdirectories of the story folder
+_VERSION_DIR = re.compile(r'^v(\d+)$')
+
+def _slug(title: str) -> str:
+    """Filesystem-safe name for a story title, shared by its JSON file and image directory"""
+    return _UNSAFE_FILENAME_CHARS.sub('', title).replace(' ', '_').lower()
+
+# Age-appropriate vocabulary levels
+VOCABULARY_LEVELS = {
+    "beginner": ("cat", "dog", "hat", "run", "big", "red", "sun", "fun", "map", "top", "see", "the", "a", "is", "in", "on", "at", "to", "and", "of"),
+    "intermediate": ("house", "tree", "book", "play", "walk", "jump", "sing", "read", "write", "draw", "happy", "sad", "good", "bad", "fast", "slow", "hot", "cold", "new", "old"),
+    "advanced": ("beautiful", "wonderful", "amazing", "exciting", "adventure", "journey", "discover", "explore", "imagine", "create", "celebrate", "friendship", "kindness", "bravery", "wisdom")
+}
+
+# The practice words each outline prompt lists, joined once at import
+VOCABULARY_PROMPT_WORDS = {level: ", ".join(words[:10]) for level, words in VOCABULARY_LEVELS.items()}
+
 class StoryGenerator:
+    vocabulary_levels = VOCABULARY_LEVELS
+    
     def __init__(self):
         self.openai_api_key = os.environ.get("OPENAI_API_KEY")
         if not self.openai_api_key:
             st.error("Please set your OpenAI API key as an environment variable: OPENAI_API_KEY")
             st.stop()
         
-        self.client = OpenAI(api_key=self.openai_api_key)
+        # One pooled HTTP/2 connection set, shared by every outline and image request;
+        # concurrent illustration workers multiplex over it instead of each opening a connection
+        self.client = OpenAI(
+            api_key=self.openai_api_key,
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            # Outline rate limits, timeouts and 5xx responses are retried with jittered exponential backoff
+            max_retries=API_RETRIES,
+            http_client=DefaultHttpxClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=MAX_IMAGE_WORKERS * 2, max_keepalive_connections=MAX_IMAGE_WORKERS)
+            )
+        )
+        
+        # Image requests retry on their own terms (see _request_illustration): a timed-out DALL-E call
+        # may already have been generated and billed, so the SDK must not silently send it again
+        self.image_client = self.client.with_options(max_retries=0)
+        
+        # Image downloads share one keep-alive session, sized so every worker gets a pooled connection,
+        # and back off and retry transient CDN failures instead of leaving a page without a picture;
+        # a read timeout is not retried, so a stalled download stays bounded by its own timeout
+        download_retry = Retry(total=API_RETRIES, read=0, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+        self.http = requests.Session()
+        self.http.mount("https://", HTTPAdapter(pool_connections=MAX_IMAGE_WORKERS, pool_maxsize=MAX_IMAGE_WORKERS, max_retries=download_retry))
+        
+        # Content hash of each story file this generator last wrote, to skip rewriting identical JSON
+        self._saved_digests: Dict[str, str] = {}
+    
+    def _outline_request(self, reading_level: str, theme: str = "adventure", genre: str = None, user_outline: str = None) -> Dict:
+        """Build the chat completion request body for a story outline"""
+        genre_str = f"\n- Genre: {genre}" if genre else ""
+        user_outline_str = f"\n- User outline: {user_outline}" if user_outline else ""
         
-        # Age-appropriate vocabulary levels
-        self.vocabulary_levels = {
-            "beginner": ["cat", "dog", "hat", "run", "big", "red", "sun", "fun", "map", "top", "see", "the", "a", "is", "in", "on", "at", "to", "and", "of"],
-            "intermediate": ["house", "tree", "book", "play", "walk", "jump", "sing", "read", "write", "draw", "happy", "sad", "good", "bad", "fast", "slow", "hot", "cold", "new", "old"],
-            "advanced": ["beautiful", "wonderful", "amazing", "exciting", "adventure", "journey", "discover", "explore", "imagine", "create", "celebrate", "friendship", "kindness", "bravery", "wisdom"]
+        # Only the per-story fields go in the user message, after the fixed instructions
+        prompt = f"""Reading level: {reading_level}
+- Use primarily these words: {VOCABULARY_PROMPT_WORDS[reading_level]}
+- Theme: {theme}{genre_str}{user_outline_str}"""
+        
+        # Structured Outputs guarantees a bare JSON object matching the schema, with no markdown fences to strip
+        return {
+            "model": OUTLINE_MODEL,
+            "messages": [
+                {"role": "system", "content": OUTLINE_INSTRUCTIONS},
+                {"role": "user", "content": prompt}
+            ],
+            "response_format": {"type": "json_schema", "json_schema": OUTLINE_SCHEMA},
+            "temperature": 0.7,
+            # A 15-page outline runs roughly 900-1350 tokens; the cap only stops runaway replies, it doesn't pad
+            "max_tokens": OUTLINE_MAX_TOKENS
         }
     
     def generate_story_outline(self, reading_level: str, theme: str = "adventure", genre: str = None, user_outline: str = None) -> Dict | None:
@@ -35,96 +204,136 @@ class StoryGenerator:
         if not self.openai_api_key:
             st.error("OpenAI API key is not set. Please set the OPENAI_API_KEY environment variable.")
             return None
-            
-        level_words = self.vocabulary_levels[reading_level]
-        
-        genre_str = f"- Genre: {genre or ''}" if genre else ""
-        user_outline_str = f"- User outline: {user_outline or ''}" if user_outline else ""
-        
-        prompt = f"""
-        Create a short story outline for a 5-year-old child at {reading_level} reading level.
-        
-        Requirements:
-        - Use primarily these words: {', '.join(level_words[:10])}
-        - Theme: {theme}
-        {genre_str}
-        {user_outline_str}
-        - Story should be about 15 pages long
-        - Each page should have 1-2 simple sentences
-        - Include repetition of key words for practice
-        - Make it engaging and fun
-        
-        Return the outline as JSON with this structure:
-        {{
-            "title": "Story Title",
-            "theme": "{theme}",
-            "reading_level": "{reading_level}",
-            "pages": [
-                {{
-                    "page_number": 1,
-                    "text": "Simple sentence here.",
-                    "key_words": ["word1", "word2"],
-                    "illustration_prompt": "Description for DALL-E to create child-friendly illustration"
-                }}
-            ]
-        }}
-        
-        IMPORTANT: Return ONLY valid JSON, no additional text or explanations.
-        """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=1000
-            )
+            stream = self.client.chat.completions.create(**self._outline_request(reading_level, theme, genre, user_outline), stream=True)
             
-            # Get the response content
-            response_content = response.choices[0].message.content.strip()
+            # Stream the reply so the child sees pages being written instead of a silent wait
+            status = st.empty()
+            parts = []
+            carry = ""
+            pages_written = 0
+            finish_reason = None
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                delta = chunk.choices[0].delta.content
+                parts.append(delta)
+                # Scan only the new text plus enough of the previous tail to catch a key split across chunks
+                window = carry + delta
+                new_pages = window.count(PAGE_MARKER)
+                carry = window[-(len(PAGE_MARKER) - 1):]
+                if new_pages:
+                    pages_written += new_pages
+                    status.caption(f"📝 Writing page {pages_written}...")
+            status.empty()
+            
+            if finish_reason == "length":
+                st.error(f"The story outline was too long and got cut off after {pages_written} pages. Please try again, or ask for a shorter story.")
+                return None
             
-            # Debug: Print the response to see what we're getting
-            # st.write("Debug - API Response:", response_content)
+            # Get the response content
+            response_content = "".join(parts)
             
             # Check if response is empty
             if not response_content:
                 st.error("Received empty response from OpenAI API")
                 return None
             
-            # Try to parse JSON
             try:
-                # First, try to parse as-is
-                story_outline = json.loads(response_content)
-                return story_outline
-            except json.JSONDecodeError:
-                # If that fails, try to extract JSON from markdown code blocks
-                try:
-                    # Remove markdown code block formatting
-                    if response_content.startswith('```json'):
-                        response_content = response_content[7:]  # Remove ```json
-                    if response_content.startswith('```'):
-                        response_content = response_content[3:]  # Remove ```
-                    if response_content.endswith('```'):
-                        response_content = response_content[:-3]  # Remove trailing ```
-                    
-                    # Clean up any extra whitespace
-                    response_content = response_content.strip()
-                    
-                    # Try parsing again
-                    story_outline = json.loads(response_content)
-                    return story_outline
-                except json.JSONDecodeError as json_error:
-                    st.error(f"Invalid JSON response: {json_error}")
-                    st.write("Raw response:", response_content)
-                    return None
+                return orjson.loads(response_content)
+            except orjson.JSONDecodeError as json_error:
+                # A schema-constrained reply only fails to parse when it was cut off at max_tokens
+                st.error(f"Invalid JSON response: {json_error}")
+                st.write("Raw response:", response_content)
+                return None
             
         except Exception as e:
             st.error(f"Error generating story outline: {e}")
             st.write("Full error details:", str(e))
             return None
     
-    def generate_illustration(self, prompt: str, page_number: int) -> str | None:
-        """Generate a child-friendly illustration for a story page"""
+    def generate_story_outline_variants(self, reading_level: str, theme: str = "adventure", genre: str = None, user_outline: str = None, n: int = 4) -> List[Dict]:
+        """Generate several alternative outlines for the same request in a single API call"""
+        # n samples share one prompt encoding and one request against the rate limit
+        try:
+            response = self.client.chat.completions.create(**self._outline_request(reading_level, theme, genre, user_outline), n=n)
+        except Exception as e:
+            st.error(f"Error generating story outlines: {e}")
+            return []
+        
+        variants = []
+        for choice in response.choices:
+            if not choice.message.content:
+                continue
+            try:
+                variants.append(orjson.loads(choice.message.content))
+            except orjson.JSONDecodeError:
+                # A truncated sample is dropped rather than failing the whole set
+                continue
+        return variants
+    
+    def submit_outline_batch(self, specs: List[Dict]) -> str | None:
+        """Submit many outline requests through the Batch API (half price, results within 24h) and return the batch id.
+        
+        Each spec holds an "id" plus the generate_story_outline arguments (reading_level, theme, genre, user_outline).
+        """
+        lines = []
+        for spec in specs:
+            body = self._outline_request(spec["reading_level"], spec.get("theme", "adventure"), spec.get("genre"), spec.get("user_outline"))
+            lines.append(json.dumps({"custom_id": str(spec["id"]), "method": "POST", "url": "/v1/chat/completions", "body": body}))
+        
+        try:
+            batch_file = self.client.files.create(file=("outlines.jsonl", "\n".join(lines).encode('utf-8')), purpose="batch")
+            batch = self.client.batches.create(input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h")
+            return batch.id
+        except Exception as e:
+            st.error(f"Error submitting story batch: {e}")
+            return None
+    
+    def collect_outline_batch(self, batch_id: str) -> Tuple[str, Dict[str, Dict]]:
+        """Check a submitted outline batch, returning its status and the outlines it produced, keyed by spec id.
+        
+        The status is the batch's own ("completed", "failed", "expired", "cancelled" are final; anything
+        else means it's still running), or "error" when the batch couldn't be checked this time.
+        """
+        try:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status != "completed":
+                if batch.status in ("failed", "expired", "cancelled"):
+                    st.error(f"Story batch {batch_id} {batch.status}")
+                return batch.status, {}
+            output = self.client.files.content(batch.output_file_id).text if batch.output_file_id else ""
+        except Exception as e:
+            st.error(f"Error checking story batch: {e}")
+            return "error", {}
+        
+        outlines = {}
+        attempted = 0
+        for line in output.splitlines():
+            attempted += 1
+            # A malformed or failed line only loses that one outline
+            try:
+                result = orjson.loads(line)
+                response = result.get("response") or {}
+                if response.get("status_code") != 200:
+                    continue
+                outlines[result["custom_id"]] = orjson.loads(response["body"]["choices"][0]["message"]["content"])
+            except (KeyError, IndexError, TypeError, AttributeError, orjson.JSONDecodeError):
+                continue
+        
+        # Requests the API rejected outright are left out of the output file, so count them from the batch
+        request_counts = getattr(batch, "request_counts", None)
+        total = max(request_counts.total, attempted) if request_counts else attempted
+        errored = total - len(outlines)
+        if errored:
+            st.warning(f"{errored} of {total} stories in batch {batch_id} could not be created")
+        return batch.status, outlines
+    
+    def _request_illustration(self, prompt: str) -> str:
+        """Request a child-friendly illustration from DALL-E and return its URL (raises on failure)"""
         enhanced_prompt = f"""
         Create a child-friendly, colorful illustration for a children's book page.
         
@@ -142,33 +351,164 @@ class StoryGenerator:
         Make it engaging and fun!
         """
         
+        # Only rate limits and server errors, which were never served, are retried; a timeout is raised
+        # at once, and every attempt shares the page's time budget
+        deadline = time.monotonic() + IMAGE_REQUEST_BUDGET
+        for attempt in range(API_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            try:
+                response = self.image_client.images.generate(
+                    model=IMAGE_MODEL,
+                    prompt=enhanced_prompt,
+                    size=IMAGE_SIZE,
+                    quality=IMAGE_QUALITY,
+                    n=1,
+                    timeout=httpx.Timeout(remaining, connect=min(10.0, remaining))
+                )
+                return response.data[0].url
+            except (RateLimitError, InternalServerError):
+                delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+                # Leave the next attempt a useful share of the budget rather than starting it with seconds left
+                if attempt == API_RETRIES or deadline - time.monotonic() - delay < 30.0:
+                    raise
+                time.sleep(delay)
+    
+    def generate_illustration(self, prompt: str, page_number: int) -> str | None:
+        """Generate a child-friendly illustration for a story page"""
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=enhanced_prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1
-            )
-            
-            image_url = response.data[0].url
-            return image_url
-            
+            return self._request_illustration(prompt)
         except Exception as e:
             st.error(f"Error generating illustration: {e}")
             return None
     
+    def _cached_image_path(self, prompt: str) -> str:
+        """Path an illustration for this prompt is cached under"""
+        # Key on every request parameter that shapes the image, so changing any of them misses the cache
+        payload = {"model": IMAGE_MODEL, "size": IMAGE_SIZE, "quality": IMAGE_QUALITY, "prompt": prompt}
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(IMAGE_CACHE_DIR, f"{key}.png")
+    
+    def _page_prompt(self, page: Dict, style_desc: str) -> str:
+        """Full illustration prompt for a page: the shared style/character description plus the page's scene"""
+        return f"{style_desc}\nPage Description: {page['illustration_prompt']}"
+    
+    def _prompt_hash(self, page: Dict) -> str:
+        """Hash recorded on a page for the scene prompt its current illustration was drawn from.
+        
+        The shared style description is left out: it quotes page 1's story text, so including it
+        would mark every page as changed whenever that text is edited.
+        """
+        return hashlib.sha256(page['illustration_prompt'].encode('utf-8')).hexdigest()
+    
+    def _illustrate_page(self, page: Dict, style_desc: str, image_dir: str, use_cache: bool = True) -> str | None:
+        """Request one page's illustration, returning the image URL still to download, or None when served from the cache"""
+        illustration_prompt = self._page_prompt(page, style_desc)
+        cached_path = self._cached_image_path(illustration_prompt)
+        
+        # Reuse the image from an earlier identical prompt instead of paying for a new one
+        if use_cache and os.path.exists(cached_path):
+            img_path = os.path.join(image_dir, f"page_{page['page_number']}.png")
+            shutil.copyfile(cached_path, img_path)
+            page["illustration_url"] = img_path
+            page["prompt_hash"] = self._prompt_hash(page)
+            return None
+        
+        return self._request_illustration(illustration_prompt)
+    
+    def _download_illustration(self, page: Dict, illustration_url: str, style_desc: str, image_dir: str):
+        """Download a page's generated illustration, point the page at the saved file and publish it to the cache"""
+        illustration_prompt = self._page_prompt(page, style_desc)
+        img_path = os.path.join(image_dir, f"page_{page['page_number']}.png")
+        
+        # Stream the image to disk in chunks rather than holding the whole PNG in memory,
+        # then point the page at the local copy
+        with self.http.get(illustration_url, timeout=60, stream=True) as response:
+            response.raise_for_status()
+            with open(img_path, 'wb') as img_file:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    img_file.write(chunk)
+        page["illustration_url"] = img_path
+        page["prompt_hash"] = self._prompt_hash(page)
+        
+        # Publish to the cache with a rename so readers never see a partial file
+        cached_path = self._cached_image_path(illustration_prompt)
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(img_path, tmp_path)
+        os.replace(tmp_path, cached_path)
+    
+    def _illustrate_pages(self, pages: List[Dict], style_desc: str, image_dir: str, use_cache: bool = True) -> List[Dict]:
+        """Illustrate all pages concurrently, since each page is an independent network round trip.
+        
+        Returns the pages that ended up with a saved illustration. The per-page requests and downloads
+        run on worker threads, so they must not call into Streamlit; their errors are raised here.
+        """
+        if not pages:
+            return []
+        # Pages with the same prompt would get the same picture, so only the first of each is requested
+        groups: Dict[str, List[Dict]] = {}
+        for page in pages:
+            groups.setdefault(page['illustration_prompt'], []).append(page)
+        
+        progress = st.progress(0.0, text="🎨 Creating beautiful illustrations...")
+        done = 0
+        illustrated = []
+        workers = min(len(groups), MAX_IMAGE_WORKERS)
+        # DALL-E requests and CDN downloads run on separate pools, so a finished image downloads
+        # while its request slot moves straight on to the next page
+        with ThreadPoolExecutor(max_workers=workers) as request_pool, ThreadPoolExecutor(max_workers=workers) as download_pool:
+            # Each pending future maps to its page group and, once requested, the image URL being downloaded
+            pending = {request_pool.submit(self._illustrate_page, group[0], style_desc, image_dir, use_cache): (group, None) for group in groups.values()}
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    group, downloading_url = pending.pop(future)
+                    try:
+                        illustration_url = future.result()
+                        if illustration_url:
+                            pending[download_pool.submit(self._download_illustration, group[0], illustration_url, style_desc, image_dir)] = (group, illustration_url)
+                            continue
+                        for page in group[1:]:
+                            img_path = os.path.join(image_dir, f"page_{page['page_number']}.png")
+                            shutil.copyfile(group[0]["illustration_url"], img_path)
+                            page["illustration_url"] = img_path
+                            page["prompt_hash"] = group[0]["prompt_hash"]
+                        illustrated.extend(group)
+                    except Exception as e:
+                        # A brand-new story has no earlier image, so it can show the short-lived DALL-E URL
+                        # for now; a regenerated page keeps pointing at its previous local image
+                        if downloading_url and use_cache:
+                            for page in group:
+                                page["illustration_url"] = downloading_url
+                        page_numbers = ", ".join(str(page['page_number']) for page in group)
+                        st.warning(f"Could not create image for page {page_numbers}: {e}")
+                    done += len(group)
+                    progress.progress(done / len(pages), text=f"🎨 Illustrated {done} of {len(pages)} pages...")
+        progress.empty()
+        return illustrated
+    
     def save_story_to_file(self, story: Dict):
         """Save the story as a JSON file in the 'stories' folder, named after the story title."""
         if not os.path.exists('stories'):
             os.makedirs('stories')
         title = story.get('title', 'untitled_story')
-        # Sanitize filename
-        filename = ''.join(c for c in title if c.isalnum() or c in (' ', '_', '-'))
-        filename = filename.replace(' ', '_').lower() + '.json'
+        filename = _slug(title) + '.json'
         filepath = os.path.join('stories', filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(story, f, ensure_ascii=False, indent=2)
+        self._write_story_json(filepath, story)
+    
+    def _write_story_json(self, filepath: str, story: Dict):
+        """Write a story atomically, skipping the write when the file already holds this exact content"""
+        data = orjson.dumps(story, option=orjson.OPT_INDENT_2)
+        digest = hashlib.sha256(data).hexdigest()
+        if self._saved_digests.get(filepath) == digest and os.path.exists(filepath):
+            return
+        
+        # Write to a temp file and rename, so a crash mid-write never leaves a torn story file
+        tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+        self._saved_digests[filepath] = digest
 
     def extract_main_character_and_style(self, story_outline: Dict) -> str:
         """Extract or synthesize a main character and style description for illustration consistency."""
@@ -188,37 +528,21 @@ class StoryGenerator:
             story_outline = self.generate_story_outline(reading_level, theme, genre or "", user_outline or "")
             if not story_outline:
                 return None
+        return self.illustrate_story(story_outline)
+
+    def illustrate_story(self, story_outline: Dict) -> Dict:
+        """Generate illustrations for an existing outline and save the story with local image paths"""
         # Save story before generating images
         self.save_story_to_file(story_outline)
         # Prepare image save directory
         title = story_outline.get('title', 'untitled_story')
-        story_dir = os.path.join('stories', ''.join(c for c in title if c.isalnum() or c in (' ', '_', '-')).replace(' ', '_').lower())
+        story_dir = os.path.join('stories', _slug(title))
         if not os.path.exists(story_dir):
             os.makedirs(story_dir)
         # Extract main character/style description for consistency
         style_desc = self.extract_main_character_and_style(story_outline)
         # Generate illustrations for each page and save locally
-        with st.spinner("🎨 Creating beautiful illustrations..."):
-            for page in story_outline["pages"]:
-                # Prepend style/character description to each prompt
-                illustration_prompt = f"{style_desc}\nPage Description: {page['illustration_prompt']}"
-                illustration_url = self.generate_illustration(
-                    illustration_prompt,
-                    page["page_number"]
-                )
-                page["illustration_url"] = illustration_url
-                # Download and save image
-                if illustration_url:
-                    img_path = os.path.join(story_dir, f"page_{page['page_number']}.png")
-                    try:
-                        response = requests.get(illustration_url)
-                        if response.status_code == 200:
-                            with open(img_path, 'wb') as img_file:
-                                img_file.write(response.content)
-                            # Update the page to point to the local image
-                            page["illustration_url"] = img_path
-                    except Exception as e:
-                        st.warning(f"Could not save image for page {page['page_number']}: {e}")
+        self._illustrate_pages(story_outline["pages"], style_desc, story_dir)
         # Save updated story with local image paths
         self.save_story_to_file(story_outline)
         return story_outline
@@ -255,47 +579,80 @@ class StoryGenerator:
         if not os.path.exists(filepath):
             st.error(f"Story file '{filename}' not found.")
             return None
-        with open(filepath, 'r', encoding='utf-8') as f:
-            story = json.load(f)
+        # Parse straight from the file bytes, skipping the str decode
+        with open(filepath, 'rb') as f:
+            story = orjson.loads(f.read())
         return story
 
-    def regenerate_images_for_story(self, story: Dict) -> Dict:
-        """Regenerate images for the story, saving them as a new version in the story's directory."""
-        title = story.get('title', 'untitled_story')
-        story_dir = os.path.join('stories', ''.join(c for c in title if c.isalnum() or c in (' ', '_', '-')).replace(' ', '_').lower())
-        # Find next version number
-        existing_versions = [d for d in os.listdir(story_dir) if re.match(r'^v\\d+$', d)] if os.path.exists(story_dir) else []
-        if existing_versions:
-            next_version = max([int(d[1:]) for d in existing_versions]) + 1
-        else:
-            next_version = 2
-        version_dir = os.path.join(story_dir, f'v{next_version}')
-        os.makedirs(version_dir, exist_ok=True)
+    def _next_image_version(self, story_dir: str) -> int:
+        """Claim the next image version for a story, creating its vN directory and recording N in .version"""
+        os.makedirs(story_dir, exist_ok=True)
+        version_file = os.path.join(story_dir, '.version')
+        try:
+            with open(version_file, 'r', encoding='utf-8') as f:
+                current = int(f.read().strip())
+        except (OSError, ValueError):
+            # Folders from before the counter existed: fall back to the highest vN directory once
+            versions = [int(m.group(1)) for m in map(_VERSION_DIR.match, os.listdir(story_dir)) if m]
+            current = max(versions, default=1)
+        
+        # Creating the directory is the claim: it fails if another regeneration, in this or another
+        # process, already took the number, so two runs can never share a version directory
+        next_version = current + 1
+        while True:
+            try:
+                os.makedirs(os.path.join(story_dir, f'v{next_version}'))
+                break
+            except FileExistsError:
+                next_version += 1
+        
+        tmp_path = f"{version_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(next_version))
+        os.replace(tmp_path, version_file)
+        return next_version
+    
+    def regenerate_images_for_story(self, story: Dict, pages: List[int] | None = None, only_changed: bool = False) -> Tuple[Dict, List[Dict], List[Dict]]:
+        """Regenerate images for the story, saving them as a new version in the story's directory.
+        
+        pages limits regeneration to those page indexes; only_changed further skips pages whose
+        illustration prompt is unchanged since their current image was drawn and whose image file
+        still exists. Returns the story, the pages targeted and the pages actually re-drawn.
+        """
         # Extract main character/style description for consistency
         style_desc = self.extract_main_character_and_style(story)
-        # Generate new images and update illustration_url
-        for page in story["pages"]:
-            illustration_prompt = f"{style_desc}\nPage Description: {page['illustration_prompt']}"
-            illustration_url = self.generate_illustration(
-                illustration_prompt,
-                page["page_number"]
-            )
-            # Download and save image
-            img_path = os.path.join(version_dir, f"page_{page['page_number']}.png")
-            if illustration_url:
-                try:
-                    response = requests.get(illustration_url)
-                    if response.status_code == 200:
-                        with open(img_path, 'wb') as img_file:
-                            img_file.write(response.content)
-                        page["illustration_url"] = img_path
-                except Exception as e:
-                    st.warning(f"Could not save image for page {page['page_number']}: {e}")
+        targets = [story["pages"][i] for i in pages] if pages is not None else story["pages"]
+        if only_changed:
+            targets = [
+                page for page in targets
+                if page.get("prompt_hash") != self._prompt_hash(page)
+                or not os.path.exists(page.get("illustration_url") or "")
+            ]
+        if not targets:
+            return story, [], []
+        
+        title = story.get('title', 'untitled_story')
+        story_dir = os.path.join('stories', _slug(title))
+        next_version = self._next_image_version(story_dir)
+        version_dir = os.path.join(story_dir, f'v{next_version}')
+        # Draw on copies of the pages and merge back only those whose new image was saved, so a failed
+        # page (and every page not targeted) keeps its earlier version's image
+        # Regenerating means asking for fresh images, so skip the cache lookup
+        drafts = [dict(page) for page in targets]
+        drawn = {id(draft) for draft in self._illustrate_pages(drafts, style_desc, version_dir, use_cache=False)}
+        redrawn = []
+        for page, draft in zip(targets, drafts):
+            if id(draft) in drawn:
+                page.update(draft)
+                redrawn.append(page)
+        if not redrawn:
+            # Every request failed: drop the empty version rather than saving a copy of the old story
+            shutil.rmtree(version_dir, ignore_errors=True)
+            return story, targets, []
         # Save updated story as a new versioned JSON file
         versioned_json = os.path.join(story_dir, f'story_v{next_version}.json')
-        with open(versioned_json, 'w', encoding='utf-8') as f:
-            json.dump(story, f, ensure_ascii=False, indent=2)
-        return story
+        self._write_story_json(versioned_json, story)
+        return story, targets, redrawn
 
 if __name__ == "__main__":
     # Test the story generator